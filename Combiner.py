@@ -6,9 +6,11 @@
 
 from __future__ import annotations
 from pathlib import Path
-from typing import List, Dict
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+import os
+import numpy as np
 import pandas as pd
-from datetime import timedelta
 
 TICKERS = [
     "TSLA","NVDA","AAPL","MSFT","AMZN",
@@ -25,167 +27,165 @@ OUT_DIR.mkdir(parents=True, exist_ok=True)
 EX_COL = "Excess Daily Return"   # from daily files (decimal, e.g., 0.0123 = 1.23%)
 DP = 3                           # percent decimals
 
-def _read_gst_hits(ticker: str, year: int) -> pd.DataFrame:
-    p = GST_NO_OVERLAP_DIR / f"{ticker}_{year}_th85_no_overlap.csv"
-    if not p.exists():
-        return pd.DataFrame(columns=["Week", ticker, "isPartial"])
-    df = pd.read_csv(p, encoding="utf-8-sig")
-    if "Week" not in df.columns:
-        return pd.DataFrame(columns=["Week", ticker, "isPartial"])
-    df["Week"] = pd.to_datetime(df["Week"], errors="coerce")
-    df = df.dropna(subset=["Week"])
-    return df[df["Week"].dt.year.eq(year)].reset_index(drop=True)
-
-def _window(anchor: pd.Timestamp) -> tuple[pd.Timestamp, pd.Timestamp]:
-    # 3-week window centered on anchor week start X: [X-7, X+13] inclusive
-    return anchor - timedelta(days=7), anchor + timedelta(days=13)
-
-def _read_daily_excess_span(ticker: str,
-                            start_date: pd.Timestamp,
-                            end_date: pd.Timestamp) -> pd.DataFrame:
-    years = {start_date.year, end_date.year}
-    if end_date.year - start_date.year > 1:
-        years.update(range(start_date.year, end_date.year + 1))
-
+def _read_gst_hits_all_years(ticker: str) -> pd.DataFrame:
+    """Every no-overlap GST hit for a ticker across YEARS -> [Week (datetime64), year]."""
     frames: List[pd.DataFrame] = []
-    for yr in sorted(years):
-        p = DAILY_DIR / f"{ticker}_{yr}_excess.csv"
+    for yr in YEARS:
+        p = GST_NO_OVERLAP_DIR / f"{ticker}_{yr}_th85_no_overlap.csv"
         if not p.exists():
             continue
-        tmp = pd.read_csv(p)
-        if "Date" not in tmp.columns or EX_COL not in tmp.columns:
+        try:
+            frames.append(pd.read_csv(p, encoding="utf-8-sig", usecols=["Week"], dtype={"Week": str})
+                          .assign(year=yr))
+        except ValueError:   # no 'Week' column
             continue
-        tmp["Date"] = pd.to_datetime(tmp["Date"], errors="coerce")
-        tmp = tmp.dropna(subset=["Date"])
-        frames.append(tmp[["Date", EX_COL]])
-
     if not frames:
-        return pd.DataFrame(columns=["Date", EX_COL])
+        return pd.DataFrame({"Week": pd.Series(dtype="datetime64[ns]"), "year": pd.Series(dtype="int64")})
+
+    hits = pd.concat(frames, ignore_index=True)
+    # one date parse for all years, with the explicit ISO format
+    hits["Week"] = pd.to_datetime(hits["Week"], format="%Y-%m-%d", errors="coerce")
+    hits = hits.dropna(subset=["Week"])
+    return hits[hits["Week"].dt.year.eq(hits["year"])].reset_index(drop=True)
 
-    df = pd.concat(frames, ignore_index=True)
-    df = df[(df["Date"] >= pd.to_datetime(start_date)) & (df["Date"] <= pd.to_datetime(end_date))]
-    df = df.sort_values("Date").reset_index(drop=True)
-    df[EX_COL] = pd.to_numeric(df[EX_COL], errors="coerce").round(6)  # decimal
-    return df.dropna(subset=[EX_COL]).reset_index(drop=True)
+def _load_year(ticker: str, year: int) -> pd.DataFrame | None:
+    """One year of daily excess returns: [Date, EX_COL] sorted by Date (None if unusable)."""
+    p = DAILY_DIR / f"{ticker}_{year}_excess.parquet"
+    if not p.exists():
+        p = p.with_suffix(".csv")   # older runs only wrote the CSV
+        if not p.exists():
+            return None
+    try:
+        if p.suffix == ".parquet":
+            # already typed on disk: no text parse at all
+            tmp = pd.read_parquet(p, columns=["Date", EX_COL])
+        else:
+            # typed read: skip the other columns and the dtype-inference pass
+            tmp = pd.read_csv(p, usecols=["Date", EX_COL], dtype={EX_COL: "float64"},
+                              parse_dates=["Date"], date_format="%Y-%m-%d")
+    except ValueError:   # missing columns
+        return None
+    tmp = tmp.dropna(subset=["Date", EX_COL])
+    if tmp.empty:
+        return None
+    return tmp.sort_values("Date", ignore_index=True)
+
+def _load_daily_all(ticker: str) -> pd.DataFrame:
+    """Every daily year a window around YEARS can touch, stacked into one date-sorted frame."""
+    frames = [f for f in (_load_year(ticker, yr) for yr in range(YEARS[0] - 1, YEARS[-1] + 2))
+              if f is not None]
+    if not frames:
+        return pd.DataFrame({"Date": pd.Series(dtype="datetime64[ns]"),
+                             EX_COL: pd.Series(dtype="float64")})
+    return pd.concat(frames, ignore_index=True).sort_values("Date", kind="stable", ignore_index=True)
 
 def _fmt_pct(x: float | None) -> str:
     if x is None:
         return ""
     return f"{x*100:.{DP}f}%"  # decimal -> percent string with symbol
 
-def main():
-    for tkr in TICKERS:
-        rows: List[Dict] = []
-
-        for yr in YEARS:
-            hits = _read_gst_hits(tkr, yr)
-            if hits.empty:
-                continue
-
-            for _, r in hits.iterrows():
-                anchor = pd.to_datetime(r["Week"])
-                w_start, w_end = _window(anchor)
-
-                daily = _read_daily_excess_span(tkr, w_start, w_end)
-                if daily.empty:
-                    rows.append({
-                        "ticker": tkr, "year": yr,
-                        "anchor_week_start": anchor.date().isoformat(),
-                        "window_start": w_start.date().isoformat(),
-                        "window_end": w_end.date().isoformat(),
-                        "max_abs_excess_return_date": "",
-                        "max_abs_excess_return_pct": "",
-                        "pos_in_window_abs": "",
-                        "max_pos_excess_return_date": "",
-                        "max_pos_excess_return_pct": "",
-                        "pos_in_window_pos": "",
-                        "pos_streak_days_from_max": "",
-                        "num_trading_days": 0
-                    })
-                    continue
-
-                # Largest ABSOLUTE move (keep sign)
-                daily["_abs"] = daily[EX_COL].abs()
-                idx_abs = daily["_abs"].idxmax()
-                date_abs = pd.to_datetime(daily.loc[idx_abs, "Date"])
-                val_abs_dec = float(daily.loc[idx_abs, EX_COL])
-                pos_abs = int(daily.index.get_loc(idx_abs) + 1)
-
-                # Largest POSITIVE move (if any) + streak of >=0 from that day
-                pos_df = daily[daily[EX_COL] > 0]
-                if not pos_df.empty:
-                    idx_pos = pos_df[EX_COL].idxmax()
-                    date_pos = pd.to_datetime(daily.loc[idx_pos, "Date"])
-                    val_pos_dec = float(daily.loc[idx_pos, EX_COL])
-                    pos_pos = int(daily.index.get_loc(idx_pos) + 1)
-
-                    # count consecutive non-negative days starting at the max-positive day
-                    streak = 0
-                    for v in daily.loc[idx_pos:, EX_COL].values:
-                        if pd.notna(v) and v >= 0:
-                            streak += 1
-                        else:
-                            break
-
-                    date_pos_str = date_pos.date().isoformat()
-                    val_pos_pct_str = _fmt_pct(val_pos_dec)
-                    pos_pos_out = pos_pos
-                    streak_out = streak
-                else:
-                    date_pos_str = ""
-                    val_pos_pct_str = ""
-                    pos_pos_out = ""
-                    streak_out = ""
-
-                rows.append({
-                    "ticker": tkr,
-                    "year": yr,
-                    "anchor_week_start": anchor.date().isoformat(),
-                    "window_start": w_start.date().isoformat(),
-                    "window_end": w_end.date().isoformat(),
-                    "max_abs_excess_return_date": date_abs.date().isoformat(),
-                    "max_abs_excess_return_pct": _fmt_pct(val_abs_dec),
-                    "pos_in_window_abs": pos_abs,
-                    "max_pos_excess_return_date": date_pos_str,
-                    "max_pos_excess_return_pct": val_pos_pct_str,
-                    "pos_in_window_pos": pos_pos_out,
-                    "pos_streak_days_from_max": streak_out,
-                    "num_trading_days": int(len(daily))
-                })
-
-        out = OUT_DIR / f"{tkr}_conjunction.csv"
-        if not rows:
-            pd.DataFrame(columns=[
-                "ticker","year","anchor_week_start","window_start","window_end",
-                "max_abs_excess_return_date","max_abs_excess_return_pct","pos_in_window_abs",
-                "max_pos_excess_return_date","max_pos_excess_return_pct","pos_in_window_pos",
-                "pos_streak_days_from_max","num_trading_days"
-            ]).to_csv(out, index=False, encoding="utf-8")
-            print(f"[{tkr}] wrote 0 rows → {out.name}")
-            continue
+def _per_hit(values, hit_ids, n_hits: int) -> pd.Series:
+    """Values known for some hits -> one cell per hit, blank ("") where the hit has none."""
+    return pd.Series(values, index=hit_ids, dtype=object).reindex(range(n_hits), fill_value="")
 
-        df_all = pd.DataFrame(rows)
-        df_all["anchor_week_start"] = pd.to_datetime(df_all["anchor_week_start"])
-        df_all = df_all.sort_values(["year", "anchor_week_start"], ascending=[False, True])
-        df_all["anchor_week_start"] = df_all["anchor_week_start"].dt.date.astype(str)
-        df_all.to_csv(out, index=False, encoding="utf-8")
-        print(f"[{tkr}] wrote {len(df_all)} rows → {out.name}")
-
-        # --- per-ticker summary with two averages ---
-        pos_series = pd.to_numeric(df_all["pos_in_window_pos"], errors="coerce").dropna()
-        avg_pos = float(pos_series.mean()) if len(pos_series) else None
-
-        streak_series = pd.to_numeric(df_all["pos_streak_days_from_max"], errors="coerce")
-        streak_series = streak_series[streak_series > 0].dropna()
-        avg_streak = float(streak_series.mean()) if len(streak_series) else None
-
-        summary = pd.DataFrame([{
-            "ticker": tkr,
-            "avg_pos_in_window_pos": avg_pos,                  # average index (1–15)
-            "avg_pos_streak_days_from_max": avg_streak         # average consecutive non-negative days
-        }])
-        summary_path = OUT_DIR / f"{tkr}_conjunction_summary.csv"
-        summary.to_csv(summary_path, index=False, encoding="utf-8")
+def _conjunction_rows(ticker: str, hits: pd.DataFrame) -> pd.DataFrame:
+    """All of a ticker's GST hits (Week, year) -> one conjunction row per hit, computed in one pass."""
+    n_hits = len(hits)
+    anchors = hits["Week"]   # hits come with a fresh 0..n-1 index
+    # 3-week window centered on anchor week start X: [X-7, X+13] inclusive
+    w_start = anchors - pd.Timedelta(days=7)
+    w_end = anchors + pd.Timedelta(days=13)
+
+    daily = _load_daily_all(ticker)
+    dates = daily["Date"].to_numpy()
+    ret = daily[EX_COL].to_numpy()
+
+    # each window is the slice [lo, hi) of the date-sorted daily rows
+    lo = np.searchsorted(dates, w_start.to_numpy(), side="left")
+    hi = np.searchsorted(dates, w_end.to_numpy(), side="right")
+    n = hi - lo
+
+    # pad every non-empty window to one (hits x width) matrix; argmax(axis=1) keeps the earliest day on ties
+    h_abs = np.flatnonzero(n > 0)   # hits with at least one trading day
+    width = max(int(n.max(initial=0)), 1)
+    cols = lo[h_abs, None] + np.arange(width)
+    valid = cols < hi[h_abs, None]
+    win = ret[np.minimum(cols, hi[h_abs, None] - 1)]
+
+    # Largest ABSOLUTE move (keep sign)
+    k_abs = np.argmax(np.where(valid, np.abs(win), -np.inf), axis=1)
+    r_abs = lo[h_abs] + k_abs
+
+    # Largest POSITIVE move (if any) + streak of >=0 from that day, capped at the window end
+    pos = np.where(valid & (win > 0), win, -np.inf)
+    k_pos = np.argmax(pos, axis=1)
+    has_pos = np.isfinite(pos.max(axis=1))
+    h_pos, r_pos = h_abs[has_pos], lo[h_abs[has_pos]] + k_pos[has_pos]
+    neg = np.flatnonzero(ret < 0)
+    next_neg = np.append(neg, len(ret))[np.searchsorted(neg, r_pos)]
+    streak = np.minimum(next_neg, hi[h_pos]) - r_pos
+
+    def _iso(d) -> pd.Index:
+        return pd.DatetimeIndex(d).strftime("%Y-%m-%d")
+
+    return pd.DataFrame({
+        "ticker": ticker,
+        "year": hits["year"].to_numpy(),
+        "anchor_week_start": anchors,
+        "window_start": _iso(w_start),
+        "window_end": _iso(w_end),
+        "max_abs_excess_return_date": _per_hit(_iso(dates[r_abs]), h_abs, n_hits),
+        "max_abs_excess_return_pct": _per_hit([_fmt_pct(x) for x in ret[r_abs]], h_abs, n_hits),
+        "pos_in_window_abs": _per_hit(r_abs - lo[h_abs] + 1, h_abs, n_hits),
+        "max_pos_excess_return_date": _per_hit(_iso(dates[r_pos]), h_pos, n_hits),
+        "max_pos_excess_return_pct": _per_hit([_fmt_pct(x) for x in ret[r_pos]], h_pos, n_hits),
+        "pos_in_window_pos": _per_hit(r_pos - lo[h_pos] + 1, h_pos, n_hits),
+        "pos_streak_days_from_max": _per_hit(streak, h_pos, n_hits),
+        "num_trading_days": n,
+    })
+
+def _process_ticker(tkr: str) -> str:
+    """Conjunction CSV + per-ticker summary for one ticker (runs in a worker process) -> log line."""
+    hits = _read_gst_hits_all_years(tkr)
+
+    out = OUT_DIR / f"{tkr}_conjunction.csv"
+    if hits.empty:
+        pd.DataFrame(columns=[
+            "ticker","year","anchor_week_start","window_start","window_end",
+            "max_abs_excess_return_date","max_abs_excess_return_pct","pos_in_window_abs",
+            "max_pos_excess_return_date","max_pos_excess_return_pct","pos_in_window_pos",
+            "pos_streak_days_from_max","num_trading_days"
+        ]).to_csv(out, index=False, encoding="utf-8")
+        return f"[{tkr}] wrote 0 rows → {out.name}"
+
+    df_all = _conjunction_rows(tkr, hits)
+    df_all = df_all.sort_values(["year", "anchor_week_start"], ascending=[False, True])
+    df_all["anchor_week_start"] = df_all["anchor_week_start"].dt.strftime("%Y-%m-%d")
+    df_all.to_csv(out, index=False, encoding="utf-8")
+
+    # --- per-ticker summary with two averages ---
+    pos_series = pd.to_numeric(df_all["pos_in_window_pos"], errors="coerce").dropna()
+    avg_pos = float(pos_series.mean()) if len(pos_series) else None
+
+    streak_series = pd.to_numeric(df_all["pos_streak_days_from_max"], errors="coerce")
+    streak_series = streak_series[streak_series > 0].dropna()
+    avg_streak = float(streak_series.mean()) if len(streak_series) else None
+
+    summary = pd.DataFrame([{
+        "ticker": tkr,
+        "avg_pos_in_window_pos": avg_pos,                  # average index (1–15)
+        "avg_pos_streak_days_from_max": avg_streak         # average consecutive non-negative days
+    }])
+    summary_path = OUT_DIR / f"{tkr}_conjunction_summary.csv"
+    summary.to_csv(summary_path, index=False, encoding="utf-8")
+    return f"[{tkr}] wrote {len(df_all)} rows → {out.name}"
+
+def main():
+    # tickers are independent (own inputs/outputs), so spread them across CPU cores;
+    # map() yields in ticker order, so the log reads the same as a serial run
+    with ProcessPoolExecutor(max_workers=min(len(TICKERS), os.cpu_count() or 1)) as ex:
+        for line in ex.map(_process_ticker, TICKERS):
+            print(line)
 
     print("\nDone. Combined files saved in:", OUT_DIR.resolve())
 
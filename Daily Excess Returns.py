@@ -1,9 +1,9 @@
 #!/usr/bin/env python3
-# Daily Excess Returns (yfinance) with % columns (3 dp)
+# Daily Excess Returns (yfinance) with numeric % columns (3 dp)
 
 from __future__ import annotations
 from pathlib import Path
-from typing import List
+from typing import Dict, List
 import pandas as pd
 import yfinance as yf
 
@@ -18,53 +18,41 @@ OUTDIR = Path("Daily Excess Return Data")
 OUTDIR.mkdir(parents=True, exist_ok=True)
 
 RAW_DP = 4   # raw decimals
-PCT_DP = 3   # percent columns (with %)
+PCT_DP = 3   # percent columns (numeric, e.g. 1.234 = 1.234%)
 
-def _fmt_pct(x: float) -> str:
-    return f"{x*100:.{PCT_DP}f}%"
-
-def _dl_prices(ticker: str, start: str, end: str) -> pd.Series:
+def _dl_closes(year: int) -> Dict[str, pd.Series]:
     """
-    Download adjusted prices as a Series (name=ticker).
-    Handles cases where df['Close'] is returned as a DataFrame.
+    One batched download of every ticker + BENCH for a calendar year.
+    Returns {ticker: adjusted close Series}; tickers that failed are simply absent.
     """
     df = yf.download(
-        ticker, start=start, end=end,
-        auto_adjust=True, progress=False, group_by="column", threads=False
+        TICKERS + [BENCH], start=f"{year}-01-01", end=f"{year+1}-01-01",
+        auto_adjust=True, progress=False, group_by="ticker", threads=True
     )
+    closes: Dict[str, pd.Series] = {}
     if df is None or df.empty:
-        return pd.Series(dtype=float)
-
-    # Prefer 'Close' (auto_adjust=True puts adjusted in Close). Fallback to 'Adj Close'.
-    close = None
-    if "Close" in df.columns:
-        close = df["Close"]
-    elif "Adj Close" in df.columns:
-        close = df["Adj Close"]
-    else:
-        # Some odd cases return a single column – squeeze it.
-        close = df.squeeze("columns")
-
-    # If still a DataFrame (e.g., MultiIndex or single-col DataFrame), squeeze to Series.
-    if isinstance(close, pd.DataFrame):
-        if close.shape[1] == 1:
-            close = close.iloc[:, 0]
-        else:
-            # Multiple cols not expected for a single ticker; pick first as fallback
-            close = close.iloc[:, 0]
-
-    s = pd.Series(close.values, index=pd.to_datetime(close.index), name=ticker).sort_index()
-    return s
+        return closes
+
+    for t in TICKERS + [BENCH]:
+        if t not in df.columns.get_level_values(0):
+            continue
+        sub = df[t]
+        # Prefer 'Close' (auto_adjust=True puts adjusted in Close). Fallback to 'Adj Close'.
+        col = "Close" if "Close" in sub.columns else "Adj Close" if "Adj Close" in sub.columns else None
+        if col is None:
+            continue
+        # The batch is aligned on the union of all tickers' dates; drop days this one has no price
+        close = sub[col].dropna()
+        if not close.empty:
+            closes[t] = pd.Series(close.values, index=pd.to_datetime(close.index), name=t).sort_index()
+    return closes
 
 def _daily_returns(s: pd.Series) -> pd.Series:
     return s.pct_change().dropna()
 
-def _one_year_df(tkr: str, year: int) -> pd.DataFrame:
-    start = f"{year}-01-01"
-    end   = f"{year+1}-01-01"
-
-    s_tkr = _dl_prices(tkr, start, end)
-    s_spy = _dl_prices(BENCH, start, end)
+def _one_year_df(tkr: str, closes: Dict[str, pd.Series]) -> pd.DataFrame:
+    s_tkr = closes.get(tkr, pd.Series(dtype=float))
+    s_spy = closes.get(BENCH, pd.Series(dtype=float))
 
     if s_tkr.empty or s_spy.empty:
         return pd.DataFrame(columns=[
@@ -85,26 +73,24 @@ def _one_year_df(tkr: str, year: int) -> pd.DataFrame:
         f"{tkr} Daily Return": r_tkr.round(RAW_DP).values,
         "SPY Daily Return":   r_spy.round(RAW_DP).values,
         "Excess Daily Return": r_exc.round(RAW_DP).values,
+        f"{tkr} Daily Return (%)": (r_tkr.values * 100).round(PCT_DP),
+        "SPY Daily Return (%)":     (r_spy.values * 100).round(PCT_DP),
+        "Excess Daily Return (%)":  (r_exc.values * 100).round(PCT_DP),
     })
 
-    df[f"{tkr} Daily Return (%)]"] = [ _fmt_pct(x) for x in r_tkr.values ]
-    df["SPY Daily Return (%)"]     = [ _fmt_pct(x) for x in r_spy.values ]
-    df["Excess Daily Return (%)"]  = [ _fmt_pct(x) for x in r_exc.values ]
-
-    df = df[[
-        "Date",
-        f"{tkr} Daily Return", "SPY Daily Return", "Excess Daily Return",
-        f"{tkr} Daily Return (%)]", "SPY Daily Return (%)", "Excess Daily Return (%)"
-    ]]
-
-    return df.reset_index(drop=True)
+    return df
 
 def main():
+    # one request per year for all tickers (SPY included once), threaded inside yfinance
+    closes_by_year = {yr: _dl_closes(yr) for yr in YEARS}
+
     for tkr in TICKERS:
         for yr in YEARS:
             out = OUTDIR / f"{tkr}_{yr}_excess.csv"
-            df = _one_year_df(tkr, yr)
+            df = _one_year_df(tkr, closes_by_year[yr])
             df.to_csv(out, index=False, encoding="utf-8")
+            # typed copy for Combiner, which reads every year many times (needs pyarrow)
+            df.to_parquet(out.with_suffix(".parquet"), engine="pyarrow", compression="zstd", index=False)
             print(f"[{tkr} {yr}] wrote {len(df):4d} rows → {out.name}")
     print("\nDone. Files saved in:", OUTDIR.resolve())
 
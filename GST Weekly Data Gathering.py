@@ -1,12 +1,16 @@
 #!/usr/bin/env python3
 # GST Weekly Data Gathering (per-year files) — US, Web Search, 2014–2019
 # Writes: GST Data/Weekly Data/<TICKER>_<YEAR>.csv with columns: Week,<TICKER>,isPartial
+#         (or .parquet when RAW_FORMAT = "parquet")
 
 from __future__ import annotations
 from pathlib import Path
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+import threading
 import time, random
 import pandas as pd
 from pytrends.request import TrendReq
+from pytrends.exceptions import ResponseError, TooManyRequestsError
 
 # -------- Settings --------
 TICKERS = [
@@ -26,77 +30,158 @@ CATEGORY = 0   # All categories
 # Output folder
 OUTDIR = Path("GST Data") / "Weekly Data"
 OUTDIR.mkdir(parents=True, exist_ok=True)
+RAW_FORMAT = "csv"   # "csv" or "parquet" (zstd, needs pyarrow; the sorting step reads either)
 
 # Light pacing to reduce 429s
-BETWEEN_YEARS   = (1.0, 2.0)   # delay between year requests for a ticker
+BETWEEN_YEARS   = (1.0, 2.0)   # delay before the next year, only after a year that hit a 429
 BETWEEN_TICKERS = (1.5, 3.0)   # delay between tickers
-BATCH_SIZE      = 6
-BATCH_PAUSE_S   = 20
-HARD_429_SLEEP  = 60           # on 429, cool-off
-
-def fetch_one_year(pt: TrendReq, term: str, year: int) -> pd.DataFrame:
-    """Weekly GST for a single calendar year -> DataFrame[Week, term, isPartial]."""
+BATCH_SIZE      = 6            # after every BATCH_SIZE tickers, all workers pause …
+BATCH_PAUSE_S   = 20           # … for this long
+BASE_429_SLEEP  = 15           # first cool-off for a 429 without Retry-After, doubled on each further one …
+HARD_429_SLEEP  = 60           # … up to this cap
+MAX_WORKERS     = 4            # tickers fetched in parallel; lower this if 429s appear
+
+# One TrendReq per worker thread (pytrends keeps cookies/state on the client)
+_local = threading.local()
+
+def _client() -> TrendReq:
+    if not hasattr(_local, "pt"):
+        # Important: retries=0 avoids urllib3 'method_whitelist' issue inside pytrends
+        _local.pt = TrendReq(hl="en-US", tz=0, timeout=(30, 60), retries=0, backoff_factor=0.0)
+    return _local.pt
+
+# Shared batch pause: no worker sends a request before this time.monotonic() value
+_pause_lock = threading.Lock()
+_resume_at = 0.0
+
+def _batch_pause(seconds: float) -> None:
+    """Hold every worker, not just the caller, for `seconds` from now."""
+    global _resume_at
+    with _pause_lock:
+        _resume_at = max(_resume_at, time.monotonic() + seconds)
+
+def _wait_for_batch_pause() -> None:
+    with _pause_lock:
+        delay = _resume_at - time.monotonic()
+    if delay > 0:
+        time.sleep(delay)
+
+def _retry_after(e: Exception) -> float | None:
+    """Seconds from the server's Retry-After header on a 429, if it sent one."""
+    resp = getattr(e, "response", None)
+    value = resp.headers.get("Retry-After") if resp is not None else None
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        return None  # HTTP-date form; fall back to the fixed cool-off
+
+def fetch_one_year(pt: TrendReq, term: str, year: int) -> tuple[pd.DataFrame, bool]:
+    """Weekly GST for a single calendar year -> (DataFrame[Week, term, isPartial], hit a 429?)."""
     timeframe = f"{year}-01-01 {year}-12-31"
     MAX_ATTEMPTS = 5
+    rate_limited = False
+    n_backoff = 0   # 429s without Retry-After; drives the exponential term
+    payload_ready = False   # build_payload costs its own token request; only redo it when needed
     for attempt in range(1, MAX_ATTEMPTS + 1):
+        _wait_for_batch_pause()
         try:
-            pt.build_payload([term], timeframe=timeframe, geo=GEO, gprop=GPROP, cat=CATEGORY)
+            if not payload_ready:
+                pt.build_payload([term], timeframe=timeframe, geo=GEO, gprop=GPROP, cat=CATEGORY)
+                payload_ready = True
             df = pt.interest_over_time()
             if df is None or df.empty or term not in df.columns:
                 raise RuntimeError("Empty result or missing term column")
 
-            out = pd.DataFrame({
-                "Week": df.index.date,
-                term: pd.to_numeric(df[term], errors="coerce").fillna(0).round(0).astype(int),
-                "isPartial": df["isPartial"].astype(bool)
-            })
             # Keep only weeks inside the exact year (GT can spill across edges)
-            out = out[(pd.to_datetime(out["Week"]).dt.year == year)]
-            return out
+            df = df[df.index.year == year]
+            return pd.DataFrame({
+                "Week": df.index.strftime("%Y-%m-%d").to_numpy(),
+                term: pd.to_numeric(df[term], errors="coerce").fillna(0).round(0).astype(int).to_numpy(),
+                "isPartial": df["isPartial"].astype(bool).to_numpy()
+            }), rate_limited
         except Exception as e:
+            if isinstance(e, ResponseError) and not isinstance(e, TooManyRequestsError):
+                payload_ready = False   # token likely stale → rebuild before the next try
             msg = str(e).lower()
-            pause = HARD_429_SLEEP if ("429" in msg or ("rate" in msg and "limit" in msg) or "too many" in msg) \
-                   else min(6, 2 * attempt) + random.uniform(0, 0.5)
+            if "429" in msg or ("rate" in msg and "limit" in msg) or "too many" in msg:
+                # honour the server's Retry-After when given, else exponential backoff with jitter
+                rate_limited = True
+                retry_after = _retry_after(e)
+                if retry_after is None:
+                    n_backoff += 1
+                    pause = min(HARD_429_SLEEP, BASE_429_SLEEP * 2 ** (n_backoff - 1)) + random.uniform(0, 1.0)
+                else:
+                    pause = retry_after + random.uniform(0, 0.5)
+            else:
+                pause = min(6, 2 * attempt) + random.uniform(0, 0.5)
             print(f"[{term} {year}] attempt {attempt} failed: {e} — sleeping {pause:.1f}s")
             time.sleep(pause)
 
     # Failure → header-only shape for this year
-    return pd.DataFrame(columns=["Week", term, "isPartial"])
+    return pd.DataFrame(columns=["Week", term, "isPartial"]), rate_limited
+
+def write_raw(df: pd.DataFrame, out_path: Path, done_msg: str) -> None:
+    """Write one raw year (runs on the writer thread); `done_msg` is printed once the file is on disk."""
+    if RAW_FORMAT == "parquet":
+        df.to_parquet(out_path, engine="pyarrow", compression="zstd", index=False)
+        stale = out_path.with_suffix(".csv")
+    else:
+        df.to_csv(out_path, index=False, encoding="utf-8")
+        stale = out_path.with_suffix(".parquet")
+    # a pull in the other format would shadow this one in the sorting step
+    stale.unlink(missing_ok=True)
+    print(done_msg)
+
+def fetch_ticker(term: str, i: int, writer: ThreadPoolExecutor) -> tuple[int, list[Future]]:
+    """All years for one ticker (runs on a worker thread) -> (total rows, pending writes).
+
+    File writes are handed to `writer` so the fetch thread goes straight back to the network.
+    """
+    pt = _client()
+    total_rows = 0
+    writes: list[Future] = []
+    for yr in YEARS:
+        out_path = OUTDIR / f"{term}_{yr}.{RAW_FORMAT}"
+        df, rate_limited = fetch_one_year(pt, term, yr)
+
+        if df.empty:
+            writes.append(writer.submit(write_raw, pd.DataFrame(columns=["Week", term, "isPartial"]), out_path,
+                                        f"[{term}] {yr}: FAILED — wrote header-only {RAW_FORMAT}"))
+        else:
+            mx = int(df[term].max())
+            weeks = len(df)
+            total_rows += weeks
+            writes.append(writer.submit(write_raw, df, out_path,
+                                        f"[{term}] {yr}: wrote {weeks} weeks → {out_path.name} (max={mx})"))
+
+        if rate_limited:
+            time.sleep(random.uniform(*BETWEEN_YEARS))   # ease back in after a 429
+
+    # anti-burst pause before this worker picks up its next ticker
+    time.sleep(random.uniform(*BETWEEN_TICKERS))
+    if i % BATCH_SIZE == 0 and i != len(TICKERS):
+        print(f"— small batch pause ({BATCH_PAUSE_S}s, all workers) —")
+        _batch_pause(BATCH_PAUSE_S)
+    return total_rows, writes
 
 def main():
     print(f"Fetching WEEKLY Google Trends for {len(TICKERS)} tickers "
-          f"(US, {START_YEAR}–{END_YEAR}, Web Search)…\n")
-
-    # Important: retries=0 avoids urllib3 'method_whitelist' issue inside pytrends
-    pt = TrendReq(hl="en-US", tz=0, timeout=(30, 60), retries=0, backoff_factor=0.0)
-
-    for i, term in enumerate(TICKERS, start=1):
-        total_rows = 0
-        for yr in YEARS:
-            out_path = OUTDIR / f"{term}_{yr}.csv"
-            df = fetch_one_year(pt, term, yr)
-
-            if df.empty:
-                out_path.write_text(f"Week,{term},isPartial\n", encoding="utf-8")
-                print(f"[{term}] {yr}: FAILED — wrote header-only CSV")
-            else:
-                df.to_csv(out_path, index=False, encoding="utf-8")
-                mx = int(df[term].max())
-                weeks = len(df)
-                total_rows += weeks
-                print(f"[{term}] {yr}: wrote {weeks} weeks → {out_path.name} (max={mx})")
-
-            time.sleep(random.uniform(*BETWEEN_YEARS))
-
-        print(f"[{term}] total rows across {START_YEAR}-{END_YEAR}: {total_rows}")
-
-        # anti-burst pause between tickers
-        time.sleep(random.uniform(*BETWEEN_TICKERS))
-        if i % BATCH_SIZE == 0 and i != len(TICKERS):
-            print(f"— small batch pause ({BATCH_PAUSE_S}s) —")
-            time.sleep(BATCH_PAUSE_S)
-
-    print("\nDone. CSVs are in:", OUTDIR.resolve())
+          f"(US, {START_YEAR}–{END_YEAR}, Web Search, {MAX_WORKERS} workers)…\n")
+
+    # single writer thread keeps disk I/O off the fetch workers; leaving the block drains it
+    with ThreadPoolExecutor(max_workers=1) as writer:
+        with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+            futures = {pool.submit(fetch_ticker, term, i, writer): term
+                       for i, term in enumerate(TICKERS, start=1)}
+            writes: list[Future] = []
+            for fut in as_completed(futures):
+                total_rows, pending = fut.result()
+                writes.extend(pending)
+                print(f"[{futures[fut]}] total rows across {START_YEAR}-{END_YEAR}: {total_rows}")
+        for w in writes:
+            w.result()   # surface any write error
+
+    print(f"\nDone. {RAW_FORMAT} files are in:", OUTDIR.resolve())
 
 if __name__ == "__main__":
     main()
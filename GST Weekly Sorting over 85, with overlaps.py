@@ -1,11 +1,14 @@
 #!/usr/bin/env python3
 # GST Weekly Sorting over 85 (with overlaps)
 # Reads:  "GST Data/Weekly Data/<TICKER>_<YEAR>.csv"  (columns: Week,<TICKER>,isPartial)
+#         (falls back to <TICKER>_<YEAR>.parquet when the gatherer wrote parquet)
 # Writes: "GST Data/Weekly filtered, w/ overlaps/<TICKER>_<YEAR>_th85.csv"
 # Keeps the same 3 columns, just filtered to GST >= THRESHOLD.
 
 from __future__ import annotations
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+import os
 import pandas as pd
 
 # ---------- Settings ----------
@@ -47,25 +50,31 @@ def _pick_value_column(df: pd.DataFrame, term: str) -> str | None:
             return c
     return cols[0] if cols else None
 
-def filter_one_year(ticker: str, year: int) -> pd.DataFrame:
+def filter_one_year(ticker: str, year: int, log: list[str]) -> pd.DataFrame:
+    """One year of raw weekly GST -> weeks >= THRESHOLD; problems are appended to `log`."""
     path = IN_DIR / f"{ticker}_{year}.csv"
+    if not path.exists() and path.with_suffix(".parquet").exists():
+        path = path.with_suffix(".parquet")
     if not path.exists():
-        print(f"[{ticker} {year}] MISSING input: {path}")
+        log.append(f"[{ticker} {year}] MISSING input: {path}")
         return pd.DataFrame(columns=["Week", ticker, "isPartial"])
 
-    df = pd.read_csv(path, encoding="utf-8-sig")
+    if path.suffix == ".parquet":
+        df = pd.read_parquet(path)
+    else:
+        df = pd.read_csv(path, encoding="utf-8-sig")
     if "Week" not in df.columns:
-        print(f"[{ticker} {year}] malformed CSV (no 'Week'): {path.name}")
+        log.append(f"[{ticker} {year}] malformed CSV (no 'Week'): {path.name}")
         return pd.DataFrame(columns=["Week", ticker, "isPartial"])
 
     val_col = _pick_value_column(df, ticker)
     if not val_col:
-        print(f"[{ticker} {year}] could not find value column in {path.name}")
+        log.append(f"[{ticker} {year}] could not find value column in {path.name}")
         return pd.DataFrame(columns=["Week", ticker, "isPartial"])
 
-    # Parse dates once (datetime64); keep a separate date-only version for output
+    # Parse dates once (datetime64); format the output strings from it (no Python date objects)
     weeks_dt = pd.to_datetime(df["Week"], errors="coerce")
-    weeks_out = weeks_dt.dt.date
+    weeks_out = weeks_dt.dt.strftime("%Y-%m-%d")
 
     # Values and partial flags
     vals = pd.to_numeric(df[val_col].astype(str).replace("<1", "0"), errors="coerce").fillna(0).round(0).astype(int)
@@ -82,31 +91,41 @@ def filter_one_year(ticker: str, year: int) -> pd.DataFrame:
         return pd.DataFrame(columns=["Week", ticker, "isPartial"])
 
     return pd.DataFrame({
-        "Week": weeks_out[keep].astype(str).values,
+        "Week": weeks_out[keep].values,
         ticker: vals[keep].astype(int).values,
         "isPartial": part[keep].astype(bool).values
     })
 
 # ---------- Main ----------
+def process_ticker(tkr: str) -> tuple[int, int, list[str]]:
+    """Filter every year for one ticker (runs in a worker process) -> (files written, rows kept, log lines)."""
+    files, rows, log = 0, 0, []
+    for yr in YEARS:
+        filtered = filter_one_year(tkr, yr, log)
+        out_path = OUT_DIR / f"{tkr}_{yr}_th{THRESHOLD}.csv"
+
+        if filtered.empty:
+            # Always write a header so you end up with 6 per ticker
+            pd.DataFrame(columns=["Week", tkr, "isPartial"]).to_csv(out_path, index=False, encoding="utf-8")
+            log.append(f"[{tkr} {yr}] no weeks ≥ {THRESHOLD}; wrote header-only → {out_path.name}")
+        else:
+            filtered.to_csv(out_path, index=False, encoding="utf-8")
+            log.append(f"[{tkr} {yr}] kept {len(filtered)} rows ≥ {THRESHOLD} → {out_path.name}")
+            rows += len(filtered)
+
+        files += 1
+    return files, rows, log
+
 def main():
     total_files = 0
     total_rows = 0
 
-    for tkr in TICKERS:
-        for yr in YEARS:
-            filtered = filter_one_year(tkr, yr)
-            out_path = OUT_DIR / f"{tkr}_{yr}_th{THRESHOLD}.csv"
-
-            if filtered.empty:
-                # Always write a header so you end up with 6 per ticker
-                pd.DataFrame(columns=["Week", tkr, "isPartial"]).to_csv(out_path, index=False, encoding="utf-8")
-                print(f"[{tkr} {yr}] no weeks ≥ {THRESHOLD}; wrote header-only → {out_path.name}")
-            else:
-                filtered.to_csv(out_path, index=False, encoding="utf-8")
-                print(f"[{tkr} {yr}] kept {len(filtered)} rows ≥ {THRESHOLD} → {out_path.name}")
-                total_rows += len(filtered)
-
-            total_files += 1
+    # tickers are independent, so spread them across CPU cores; logs print in ticker order
+    with ProcessPoolExecutor(max_workers=min(len(TICKERS), os.cpu_count() or 1)) as ex:
+        for files, rows, log in ex.map(process_ticker, TICKERS):
+            print("\n".join(log))
+            total_files += files
+            total_rows += rows
 
     print(f"\nDone. Wrote {total_files} files to: {OUT_DIR.resolve()}")
     print(f"Total filtered rows across all files: {total_rows}")
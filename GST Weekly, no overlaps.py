@@ -6,7 +6,8 @@
 
 from __future__ import annotations
 from pathlib import Path
-from typing import List, Dict
+from typing import Dict
+import numpy as np
 import pandas as pd
 
 # ----- Settings -----
@@ -25,76 +26,91 @@ OUT_DIR = BASE / "Weekly filtered over 85, no overlaps"
 OUT_DIR.mkdir(parents=True, exist_ok=True)
 
 # ----- IO helpers -----
-def read_one(ticker: str, year: int) -> pd.DataFrame:
-    path = IN_DIR / f"{ticker}_{year}_th{THRESHOLD}.csv"
-    if not path.exists():
-        return pd.DataFrame(columns=["Week", ticker, "isPartial"])
-
-    df = pd.read_csv(path, encoding="utf-8-sig")
-    if "Week" not in df.columns:
-        return pd.DataFrame(columns=["Week", ticker, "isPartial"])
-
-    # locate the value column (usually the ticker name)
-    value_col = next((c for c in df.columns if c.lower() not in {"week", "ispartial"}), None)
-    if value_col is None:
-        return pd.DataFrame(columns=["Week", ticker, "isPartial"])
-
-    out = pd.DataFrame({
-        "Week": pd.to_datetime(df["Week"], errors="coerce"),
-        ticker: pd.to_numeric(df[value_col], errors="coerce").round(0).astype("Int64"),
-        "isPartial": (
-            df["isPartial"].astype(str).str.lower().map({"true": True, "false": False})
-            if "isPartial" in df.columns else False
-        )
-    }).dropna(subset=["Week"])
-
-    # constrain to the year (safety)
-    out = out[out["Week"].dt.year.eq(year)].reset_index(drop=True)
-    return out
+def read_all(ticker: str) -> pd.DataFrame:
+    """Every year's hits for a ticker in one frame -> [Week (datetime64), ticker, isPartial, year]."""
+    frames = []
+    for yr in YEARS:
+        path = IN_DIR / f"{ticker}_{yr}_th{THRESHOLD}.csv"
+        if not path.exists():
+            continue
+        try:
+            df = pd.read_csv(path, encoding="utf-8-sig", dtype={"Week": str})
+        except ValueError:   # empty file
+            continue
+        if df.empty or "Week" not in df.columns:
+            continue
+
+        # locate the value column (usually the ticker name)
+        value_col = next((c for c in df.columns if c.lower() not in {"week", "ispartial"}), None)
+        if value_col is None:
+            continue
+
+        frames.append(pd.DataFrame({
+            "Week": df["Week"],
+            ticker: pd.to_numeric(df[value_col], errors="coerce").round(0).astype("Int64"),
+            "isPartial": (
+                df["isPartial"].astype(str).str.lower().map({"true": True, "false": False})
+                if "isPartial" in df.columns else False
+            ),
+            "year": yr,
+        }))
+    if not frames:
+        return pd.DataFrame({"Week": pd.Series(dtype="datetime64[ns]"), ticker: pd.Series(dtype="Int64"),
+                             "isPartial": pd.Series(dtype=bool), "year": pd.Series(dtype="int64")})
+
+    hits = pd.concat(frames, ignore_index=True)
+    # Week is always ISO here (written by the sorting step); one parse for all years
+    hits["Week"] = pd.to_datetime(hits["Week"], format="%Y-%m-%d", errors="coerce")
+    hits = hits.dropna(subset=["Week"])
+    # constrain each file to its own year (safety)
+    return hits[hits["Week"].dt.year.eq(hits["year"])]
 
 def write_split_by_year(kept: pd.DataFrame, ticker: str) -> None:
+    # one groupby pass instead of a boolean filter per year
+    by_year = {yr: sub for yr, sub in kept.groupby("year", sort=False)}
     for yr in YEARS:
         out_path = OUT_DIR / f"{ticker}_{yr}_th{THRESHOLD}_no_overlap.csv"
-        sub = kept[kept["Week"].dt.year.eq(yr)][["Week", ticker, "isPartial"]].copy()
-        if sub.empty:
+        sub = by_year.get(yr)
+        if sub is None:
             pd.DataFrame(columns=["Week", ticker, "isPartial"]).to_csv(out_path, index=False, encoding="utf-8")
         else:
-            sub["Week"] = sub["Week"].dt.date.astype(str)
-            sub[ticker] = sub[ticker].astype("Int64")
-            sub.to_csv(out_path, index=False, encoding="utf-8")
+            # assign() returns the output frame directly; the group itself is never mutated
+            (sub[["Week", ticker, "isPartial"]]
+                .assign(Week=sub["Week"].dt.strftime("%Y-%m-%d"))
+                .to_csv(out_path, index=False, encoding="utf-8"))
 
 # ----- De-overlap: >= 21-day spacing between anchor starts -----
+def _keep_mask(days: np.ndarray, min_gap: int) -> np.ndarray:
+    """Greedy sweep over sorted day numbers: keep a day if it is >= min_gap after the last kept one."""
+    keep = np.zeros(len(days), dtype=bool)
+    last_kept = None
+    for i, d in enumerate(days.tolist()):   # plain ints, no Timestamp arithmetic
+        if last_kept is None or d - last_kept >= min_gap:
+            keep[i] = True
+            last_kept = d
+        # else drop (too close)
+    return keep
+
 def enforce_no_overlap(all_hits: pd.DataFrame) -> pd.DataFrame:
     if all_hits.empty:
         return all_hits
-    df = (all_hits
-          .sort_values("Week")
-          .drop_duplicates(subset=["Week"])
-          .reset_index(drop=True))
-    keep_idx: List[int] = []
-    last_kept = None
-    for i, dt in enumerate(df["Week"]):
-        # keep if this anchor starts >= 21 days after the last kept anchor
-        if last_kept is None or (dt - last_kept).days >= MIN_GAP_DAYS:
-            keep_idx.append(i)
-            last_kept = dt
-        # else drop (too close)
-    return df.loc[keep_idx].reset_index(drop=True)
+    # per-year files are concatenated in year order, so this is usually already sorted
+    df = all_hits if all_hits["Week"].is_monotonic_increasing else all_hits.sort_values("Week")
+    df = df.drop_duplicates(subset=["Week"])
+    # anchor week starts as whole days since epoch
+    days = df["Week"].to_numpy().astype("datetime64[D]").astype(np.int64)
+    return df[_keep_mask(days, MIN_GAP_DAYS)]   # index is never used downstream, so no reset
 
 # ----- Main -----
 def main():
     total_in_all, total_kept_all = 0, 0
 
     for tkr in TICKERS:
-        per_year_in: Dict[int, int] = {yr: 0 for yr in YEARS}
-        frames = []
-        for yr in YEARS:
-            df = read_one(tkr, yr)
-            per_year_in[yr] = len(df)
-            if not df.empty:
-                frames.append(df)
+        all_hits = read_all(tkr)
+        counts = all_hits["year"].value_counts()
+        per_year_in: Dict[int, int] = {yr: int(counts.get(yr, 0)) for yr in YEARS}
 
-        if not frames:
+        if all_hits.empty:
             for yr in YEARS:
                 (pd.DataFrame(columns=["Week", tkr, "isPartial"])
                  .to_csv(OUT_DIR / f"{tkr}_{yr}_th{THRESHOLD}_no_overlap.csv", index=False, encoding="utf-8"))
@@ -102,14 +118,13 @@ def main():
             print(f"[{tkr} TOTAL] kept 0 of 0 (removed 0)")
             continue
 
-        all_hits = pd.concat(frames, ignore_index=True)
         kept = enforce_no_overlap(all_hits)
         total_in_all  += len(all_hits)
         total_kept_all += len(kept)
 
         write_split_by_year(kept, tkr)
 
-        per_year_kept = kept["Week"].dt.year.value_counts().to_dict()
+        per_year_kept = kept["year"].value_counts().to_dict()
         kept_total = 0
         in_total   = 0
         for yr in YEARS: